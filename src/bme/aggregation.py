@@ -0,0 +1,447 @@
+from collections import Counter, deque
+from dataclasses import dataclass, field
+from math import ceil, floor, fsum, inf, log
+from time import monotonic
+from typing import Deque, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from bme.measurement import BMEMeasurement
+
+FIELDS = ("temperature", "pressure", "humidity", "absolute_humidity")
+DEFAULT_QUANTILES = (0.5, 0.9, 0.99)
+
+
+class RunningStatistics:
+    """Incremental count, mean, variance, minimum and maximum.
+
+    Uses Welford's algorithm for single updates and Chan's parallel
+    formula to merge, so updates are O(1) and memory is constant."""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.minimum = inf
+        self.maximum = -inf
+
+    def update(self, value: float) -> None:
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+        if value < self.minimum:
+            self.minimum = value
+        if value > self.maximum:
+            self.maximum = value
+
+    def update_many(self, values: Sequence[float]) -> None:
+        """Add a batch of values.
+
+        The batch is reduced in two tight passes and then merged,
+        which is considerably faster than calling update per value."""
+        if not values:
+            return
+        batch = RunningStatistics()
+        batch.count = len(values)
+        batch.mean = fsum(values) / batch.count
+        batch._m2 = fsum((value - batch.mean) ** 2 for value in values)
+        batch.minimum = min(values)
+        batch.maximum = max(values)
+        self.merge(batch)
+
+    def merge(self, other: "RunningStatistics") -> None:
+        if other.count == 0:
+            return
+        if self.count == 0:
+            self.count, self.mean, self._m2 = other.count, other.mean, other._m2
+            self.minimum, self.maximum = other.minimum, other.maximum
+            return
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self._m2 += other._m2 + delta * delta * self.count * other.count / count
+        self.count = count
+        self.minimum = min(self.minimum, other.minimum)
+        self.maximum = max(self.maximum, other.maximum)
+
+    @property
+    def variance(self) -> Optional[float]:
+        """Population variance, or None if no values were added."""
+        if self.count == 0:
+            return None
+        return self._m2 / self.count
+
+
+class QuantileSketch:
+    """Mergeable streaming quantile sketch with bounded memory.
+
+    Values are counted in logarithmically spaced buckets, so every
+    quantile estimate is within a relative error of `relative_accuracy`
+    of a value in the stream. When more than `max_buckets` buckets are
+    in use, the buckets closest to zero are collapsed."""
+
+    def __init__(
+        self,
+        relative_accuracy: float = 0.005,
+        max_buckets: int = 1024,
+        min_value: float = 1e-9,
+    ):
+        if not 0 < relative_accuracy < 1:
+            raise ValueError("The relative accuracy must be between 0 and 1.")
+        self.relative_accuracy = relative_accuracy
+        self.max_buckets = max_buckets
+        self.min_value = min_value
+        self._gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = log(self._gamma)
+        self._positive: Dict[int, int] = {}
+        self._negative: Dict[int, int] = {}
+        self._zero = 0
+        self.count = 0
+
+    def update(self, value: float, count: int = 1) -> None:
+        self.count += count
+        if value > self.min_value:
+            store = self._positive
+        elif value < -self.min_value:
+            store, value = self._negative, -value
+        else:
+            self._zero += count
+            return
+        index = ceil(log(value) / self._log_gamma)
+        store[index] = store.get(index, 0) + count
+        if len(store) > self.max_buckets:
+            self._collapse(store)
+
+    def update_many(self, values: Iterable[float]) -> None:
+        """Add a batch of values.
+
+        The bucket counts of the batch are computed at once and then
+        merged into the stores, collapsing them at most once."""
+        log_gamma, min_value = self._log_gamma, self.min_value
+        positive, negative = Counter(), Counter()
+        zero = 0
+        for value in values:
+            if value > min_value:
+                positive[ceil(log(value) / log_gamma)] += 1
+            elif value < -min_value:
+                negative[ceil(log(-value) / log_gamma)] += 1
+            else:
+                zero += 1
+        for store, counts in ((self._positive, positive), (self._negative, negative)):
+            for index, count in counts.items():
+                store[index] = store.get(index, 0) + count
+            if len(store) > self.max_buckets:
+                self._collapse(store)
+        self._zero += zero
+        self.count += sum(positive.values()) + sum(negative.values()) + zero
+
+    def merge(self, other: "QuantileSketch") -> None:
+        if self._gamma != other._gamma:
+            raise ValueError("Cannot merge sketches with a different accuracy.")
+        for own, theirs in (
+            (self._positive, other._positive),
+            (self._negative, other._negative),
+        ):
+            for index, count in theirs.items():
+                own[index] = own.get(index, 0) + count
+            if len(own) > self.max_buckets:
+                self._collapse(own)
+        self._zero += other._zero
+        self.count += other.count
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimate the q-quantile, with 0 <= q <= 1."""
+        if not 0 <= q <= 1:
+            raise ValueError("The quantile must be between 0 and 1.")
+        if self.count == 0:
+            return None
+        rank = q * (self.count - 1)
+        seen = 0
+        for index in sorted(self._negative, reverse=True):
+            seen += self._negative[index]
+            if seen > rank:
+                return -self._value(index)
+        seen += self._zero
+        if seen > rank:
+            return 0.0
+        for index in sorted(self._positive):
+            seen += self._positive[index]
+            if seen > rank:
+                return self._value(index)
+        return self._value(max(self._positive))
+
+    def _value(self, index: int) -> float:
+        return 2 * self._gamma**index / (self._gamma + 1)
+
+    def _collapse(self, store: Dict[int, int]) -> None:
+        indices = sorted(store)
+        excess = len(indices) - self.max_buckets
+        target = indices[excess]
+        for index in indices[:excess]:
+            store[target] += store.pop(index)
+
+
+@dataclass()
+class FieldSummary:
+    count: int
+    mean: Optional[float]
+    variance: Optional[float]
+    minimum: Optional[float]
+    maximum: Optional[float]
+    quantiles: Dict[float, Optional[float]] = field(default_factory=dict)
+
+
+@dataclass()
+class WindowSummary:
+    start: float
+    end: float
+    count: int
+    fields: Dict[str, FieldSummary]
+
+
+class FieldAggregate:
+    """Running statistics and a quantile sketch for a single field."""
+
+    def __init__(self, relative_accuracy: float = 0.005, max_buckets: int = 1024):
+        self.statistics = RunningStatistics()
+        self.sketch = QuantileSketch(
+            relative_accuracy=relative_accuracy, max_buckets=max_buckets
+        )
+
+    def update(self, value: float) -> None:
+        self.statistics.update(value)
+        self.sketch.update(value)
+
+    def update_many(self, values: Sequence[float]) -> None:
+        self.statistics.update_many(values)
+        self.sketch.update_many(values)
+
+    def merge(self, other: "FieldAggregate") -> None:
+        self.statistics.merge(other.statistics)
+        self.sketch.merge(other.sketch)
+
+    def summary(self, quantiles: Sequence[float]) -> FieldSummary:
+        statistics = self.statistics
+        if statistics.count == 0:
+            return FieldSummary(0, None, None, None, None, {q: None for q in quantiles})
+        return FieldSummary(
+            count=statistics.count,
+            mean=statistics.mean,
+            variance=statistics.variance,
+            minimum=statistics.minimum,
+            maximum=statistics.maximum,
+            # Clamp the estimates to the exact extremes.
+            quantiles={
+                q: min(
+                    statistics.maximum, max(statistics.minimum, self.sketch.quantile(q))
+                )
+                for q in quantiles
+            },
+        )
+
+
+class MeasurementAggregate:
+    """Aggregate of a number of measurements over all fields.
+
+    Missing values (None) are skipped per field."""
+
+    def __init__(self, relative_accuracy: float = 0.005, max_buckets: int = 1024):
+        self.count = 0
+        self.fields = {
+            name: FieldAggregate(
+                relative_accuracy=relative_accuracy, max_buckets=max_buckets
+            )
+            for name in FIELDS
+        }
+
+    def update(self, measurement: BMEMeasurement) -> None:
+        self.count += 1
+        for name, aggregate in self.fields.items():
+            value = getattr(measurement, name)
+            if value is not None:
+                aggregate.update(value)
+
+    def update_many(self, measurements: Sequence[BMEMeasurement]) -> None:
+        self.count += len(measurements)
+        for name, aggregate in self.fields.items():
+            values = [getattr(measurement, name) for measurement in measurements]
+            aggregate.update_many([value for value in values if value is not None])
+
+    def merge(self, other: "MeasurementAggregate") -> None:
+        self.count += other.count
+        for name, aggregate in self.fields.items():
+            aggregate.merge(other.fields[name])
+
+    def summary(
+        self, start: float, end: float, quantiles: Sequence[float]
+    ) -> WindowSummary:
+        return WindowSummary(
+            start=start,
+            end=end,
+            count=self.count,
+            fields={
+                name: aggregate.summary(quantiles)
+                for name, aggregate in self.fields.items()
+            },
+        )
+
+
+def _check_batch(
+    measurements: Sequence[BMEMeasurement], timestamps: Sequence[float]
+) -> None:
+    """Validate a batch before any of it is added."""
+    if len(measurements) != len(timestamps):
+        raise ValueError("Every measurement requires a timestamp.")
+    if any(later < earlier for earlier, later in zip(timestamps, timestamps[1:])):
+        raise ValueError("Timestamps must be non-decreasing.")
+
+
+class TumblingWindow:
+    """Aggregate measurements in consecutive, non-overlapping windows.
+
+    Windows are aligned to multiples of `duration` seconds. Timestamps
+    default to time.monotonic(), and must be non-decreasing. A summary
+    is returned once a measurement falls beyond the current window."""
+
+    def __init__(
+        self,
+        duration: float,
+        quantiles: Sequence[float] = DEFAULT_QUANTILES,
+        relative_accuracy: float = 0.005,
+        max_buckets: int = 1024,
+    ):
+        if duration <= 0:
+            raise ValueError("The window duration must be positive.")
+        self.duration = duration
+        self.quantiles = tuple(quantiles)
+        self._accuracy = (relative_accuracy, max_buckets)
+        self._start: Optional[float] = None
+        self._aggregate = MeasurementAggregate(*self._accuracy)
+
+    def add(
+        self, measurement: BMEMeasurement, timestamp: Optional[float] = None
+    ) -> Optional[WindowSummary]:
+        """Add a measurement, returning the summary of a window it closes."""
+        result = self._advance(monotonic() if timestamp is None else timestamp)
+        self._aggregate.update(measurement)
+        return result
+
+    def extend(
+        self, measurements: Sequence[BMEMeasurement], timestamps: Sequence[float]
+    ) -> List[WindowSummary]:
+        """Add a batch of measurements, returning the summaries of closed windows.
+
+        Consecutive measurements in the same window are aggregated at once."""
+        _check_batch(measurements, timestamps)
+        results = []
+        begin = 0
+        while begin < len(measurements):
+            result = self._advance(timestamps[begin])
+            if result is not None:
+                results.append(result)
+            end, window_end = begin + 1, self._start + self.duration
+            while end < len(measurements) and timestamps[end] < window_end:
+                end += 1
+            self._aggregate.update_many(measurements[begin:end])
+            begin = end
+        return results
+
+    def flush(self) -> Optional[WindowSummary]:
+        """Return the summary of the current window and start a new one."""
+        if self._start is None or self._aggregate.count == 0:
+            return None
+        result = self._aggregate.summary(
+            self._start, self._start + self.duration, self.quantiles
+        )
+        self._start = None
+        self._aggregate = MeasurementAggregate(*self._accuracy)
+        return result
+
+    def _advance(self, timestamp: float) -> Optional[WindowSummary]:
+        start = floor(timestamp / self.duration) * self.duration
+        if self._start is None:
+            self._start = start
+            return None
+        if start < self._start:
+            raise ValueError("Timestamps must be non-decreasing.")
+        if start == self._start:
+            return None
+        result = self.flush()
+        self._start = start
+        return result
+
+
+class SlidingWindow:
+    """Aggregate measurements over the last `duration` seconds.
+
+    The window is divided in `panes` tumbling panes; the oldest pane is
+    dropped as a whole once it falls out of the window. Updates are O(1),
+    memory is bounded by the number of panes and a summary merges all
+    panes. Since whole panes are dropped, the window covers at least
+    `duration` minus the duration of a single pane."""
+
+    def __init__(
+        self,
+        duration: float,
+        panes: int = 60,
+        quantiles: Sequence[float] = DEFAULT_QUANTILES,
+        relative_accuracy: float = 0.005,
+        max_buckets: int = 1024,
+    ):
+        if duration <= 0:
+            raise ValueError("The window duration must be positive.")
+        if panes < 1:
+            raise ValueError("A sliding window requires at least one pane.")
+        self.duration = duration
+        self.pane_duration = duration / panes
+        self.quantiles = tuple(quantiles)
+        self._accuracy = (relative_accuracy, max_buckets)
+        self._panes: Deque[Tuple[float, MeasurementAggregate]] = deque()
+        self._latest: Optional[float] = None
+
+    def add(
+        self, measurement: BMEMeasurement, timestamp: Optional[float] = None
+    ) -> None:
+        self._pane(monotonic() if timestamp is None else timestamp).update(measurement)
+
+    def extend(
+        self, measurements: Sequence[BMEMeasurement], timestamps: Sequence[float]
+    ) -> None:
+        """Add a batch of measurements.
+
+        Consecutive measurements in the same pane are aggregated at once."""
+        _check_batch(measurements, timestamps)
+        begin = 0
+        while begin < len(measurements):
+            aggregate = self._pane(timestamps[begin])
+            end, pane_end = begin + 1, self._panes[-1][0] + self.pane_duration
+            while end < len(measurements) and timestamps[end] < pane_end:
+                end += 1
+            aggregate.update_many(measurements[begin:end])
+            begin = end
+
+    def summary(self, timestamp: Optional[float] = None) -> WindowSummary:
+        """Summarize the window ending at the given (or latest) timestamp.
+
+        Summarizing does not evict any panes, so it has no effect on later
+        summaries."""
+        if timestamp is None:
+            timestamp = monotonic() if self._latest is None else self._latest
+        aggregate = MeasurementAggregate(*self._accuracy)
+        for start, pane in self._panes:
+            if timestamp - self.duration < start <= timestamp:
+                aggregate.merge(pane)
+        return aggregate.summary(timestamp - self.duration, timestamp, self.quantiles)
+
+    def _pane(self, timestamp: float) -> MeasurementAggregate:
+        if self._latest is not None and timestamp < self._latest:
+            raise ValueError("Timestamps must be non-decreasing.")
+        self._latest = timestamp
+        start = floor(timestamp / self.pane_duration) * self.pane_duration
+        if not self._panes or self._panes[-1][0] != start:
+            self._panes.append((start, MeasurementAggregate(*self._accuracy)))
+        self._evict(timestamp)
+        return self._panes[-1][1]
+
+    def _evict(self, timestamp: float) -> None:
+        while self._panes and self._panes[0][0] <= timestamp - self.duration:
+            self._panes.popleft()
@@ -1,6 +1,6 @@
 from enum import Enum
 from time import sleep
-from typing import Union
+from typing import Tuple, Union
 
 from smbus2 import SMBus
 
@@ -23,6 +23,7 @@ class BME280MeasurementInterval(Enum):
 
 class BME280(BMP280):
     chip_id: int = 0x60
+    _configuration_registers = (0xF2, 0xF5, 0xF4)
 
     @property
     def calibration(self) -> "BME280Calibration":
@@ -89,6 +90,17 @@ class BME280(BMP280):
     # Private #
     # ======= #
 
+    def _read_measurement_control(self) -> Tuple[int, float]:
+        """Read ctrl_meas, along with the maximum measurement time of the settings.
+
+        Includes ctrl_hum, which holds the humidity oversampling."""
+        ctrl_hum, _, ctrl_meas = self._read(0xF2, length=3)
+        return ctrl_meas, self._measurement_time(
+            self._oversampling_factor(ctrl_meas >> 5),
+            self._oversampling_factor(ctrl_meas >> 2),
+            self._oversampling_factor(ctrl_hum),
+        )
+
     def _read_calibration(self) -> None:
         """Read the sensor calibration from NVM."""
         data = self._read(0x88, length=25) + self._read(0xE1, length=7)
@@ -1,11 +1,11 @@
 from enum import Enum
-from time import sleep
-from typing import Union
+from time import monotonic, sleep
+from typing import Dict, Optional, Tuple, Union
 
 from smbus2 import SMBus
 
 from bme.common import FilterCoefficient, Mode, Oversampling, Status
-from bme.exceptions import IncorrectBMEDevice
+from bme.exceptions import IncorrectBMEDevice, MeasurementTimeout
 from bme.measurement import BMEMeasurement
 from .calibration import BMP280Calibration
 
@@ -23,6 +23,8 @@ class BMP280MeasurementInterval(Enum):
 
 class BMP280:
     chip_id: int = 0x58
+    # Configuration registers, in the order in which they must be restored.
+    _configuration_registers = (0xF5, 0xF4)
 
     def __init__(self, bus: SMBus, address: int = 0x76):
         self.address = address
@@ -79,12 +81,30 @@ class BMP280:
             value = Mode[value]
         self._write_bits(0xF4, value=value.value, mask=0b11)
 
-    def update(self) -> None:
+    def update(self, timeout: Optional[float] = None) -> None:
         """Force a single update.
 
-        After the update, the device will return to sleep."""
-        self.mode = Mode.forced
-        while self.status == Status.measuring:
+        After the update, the device will return to sleep. Raises a
+        MeasurementTimeout if the measurement is not finished within
+        timeout seconds, which defaults to twice the maximum measurement time
+        with a minimum of 10ms."""
+        # Set the mode directly, so the timing is derived from the same read.
+        ctrl_meas, measurement_time = self._read_measurement_control()
+        new_bits = (ctrl_meas & self._invert_mask(0b11)) | Mode.forced.value
+        self._write(0xF4, bytes([new_bits]))
+        if timeout is None:
+            timeout = max(2 * measurement_time, 0.01)
+        deadline = monotonic() + timeout
+        while True:
+            # Check the deadline before reading the status, so the status
+            # is always read once more after the deadline has passed.
+            expired = monotonic() > deadline
+            if self.status != Status.measuring:
+                return
+            if expired:
+                raise MeasurementTimeout(
+                    f"The measurement did not finish within {timeout:.4f}s."
+                )
             sleep(0.0001)
 
     def enable(self) -> None:
@@ -96,8 +116,26 @@ class BMP280:
         self.mode = Mode.sleep
 
     def reset(self) -> None:
-        """Perform a reset."""
+        """Perform a reset.
+
+        The reset restores the default configuration, see restore."""
         self._write(0xE0, b"\xB6")
+        self._calibration = None  # Read again, in case the device was replaced.
+
+    @property
+    def configuration(self) -> Dict[int, int]:
+        """The contents of the configuration registers.
+
+        These can be passed to restore, e.g. after a reset."""
+        return {
+            register: self._read(register)[0]
+            for register in self._configuration_registers
+        }
+
+    def restore(self, configuration: Dict[int, int]) -> None:
+        """Restore a configuration as returned by the configuration property."""
+        for register, value in configuration.items():
+            self._write(register, bytes([value]))
 
     @property
     def status(self) -> Status:
@@ -128,6 +166,14 @@ class BMP280:
         self._write_bits(0xF5, mask=0b00011100, value=value.value << 2)
         self.mode = mode
 
+    @property
+    def measurement_time(self) -> float:
+        """The maximum time in seconds a single measurement takes.
+
+        Follows the timing model of the datasheet, which depends on
+        the oversampling settings."""
+        return self._read_measurement_control()[1]
+
     # ============ #
     # Measurements #
     # ============ #
@@ -197,6 +243,34 @@ class BMP280:
         data = self._read(0x88, length=24)
         self._calibration = BMP280Calibration.from_bytes(data)
 
+    def _read_measurement_control(self) -> Tuple[int, float]:
+        """Read ctrl_meas, along with the maximum measurement time of the settings."""
+        ctrl_meas = self._read(0xF4)[0]
+        return ctrl_meas, self._measurement_time(
+            self._oversampling_factor(ctrl_meas >> 5),
+            self._oversampling_factor(ctrl_meas >> 2),
+        )
+
+    @staticmethod
+    def _oversampling_factor(bits: int) -> int:
+        """The number of samples for 3-bit oversampling settings.
+
+        Settings above 0b101 also select oversampling x16."""
+        bits &= 0b111
+        return 0 if bits == 0 else 1 << (min(bits, 5) - 1)
+
+    @staticmethod
+    def _measurement_time(*factors: int) -> float:
+        """Maximum measurement time in seconds for the given oversampling factors.
+
+        The first factor is that of the temperature, the others
+        include the additional time of the pressure and humidity measurements."""
+        milliseconds = 1.25 + 2.3 * factors[0]
+        for factor in factors[1:]:
+            if factor:
+                milliseconds += 2.3 * factor + 0.575
+        return milliseconds / 1000
+
     @staticmethod
     def _invert_mask(mask: int) -> int:
         return 0xFF - mask
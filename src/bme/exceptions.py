@@ -10,5 +10,9 @@ class MissingTemperatureReading(ValueError):
     pass
 
 
+class MeasurementTimeout(TimeoutError):
+    pass
+
+
 class UnsupportedDevice(NotImplementedError):
     pass
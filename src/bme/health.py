@@ -0,0 +1,162 @@
+from dataclasses import dataclass
+from enum import Enum
+from time import monotonic, sleep
+from typing import Callable, Dict, Optional
+
+from bme.bmp280 import BMP280
+from bme.exceptions import MeasurementTimeout
+from bme.measurement import BMEMeasurement
+
+
+class Health(Enum):
+    """Sensor health state"""
+
+    healthy = "healthy"
+    degraded = "degraded"
+    quarantined = "quarantined"
+
+
+@dataclass()
+class HealthCounters:
+    reads: int = 0
+    successes: int = 0
+    failures: int = 0
+    timeouts: int = 0
+    retries: int = 0
+    skipped: int = 0
+    quarantines: int = 0
+    probes: int = 0
+    recoveries: int = 0
+
+
+class MonitoredSensor:
+    """Wrap a sensor to read it without letting faults reach the caller.
+
+    Every read makes at most a single attempt, so it blocks no longer than
+    a single measurement and its timeout. After a failed attempt the sensor
+    is degraded, and it is not accessed again until a backoff has passed,
+    which doubles with every consecutive failure up to `max_backoff`
+    seconds. After `quarantine_after` consecutive failures the sensor is
+    quarantined until the quarantine expires. It is then re-probed by
+    checking its chip ID and resetting it, after which its configuration
+    is restored. A sensor that fails the probe, or fails its first read
+    after the probe, is quarantined again for twice as long, up to
+    `max_quarantine_time` seconds. Only a successful read resets the
+    quarantine time.
+
+    The configuration is read when wrapping, unless it is given. If the
+    sensor cannot be read at that time, it starts out quarantined and its
+    configuration is read on the first successful probe, without a reset.
+
+    Reading never raises on an OSError, a MeasurementTimeout or a
+    ValueError caused by corrupt register values, but returns None instead."""
+
+    def __init__(
+        self,
+        sensor: BMP280,
+        configuration: Optional[Dict[int, int]] = None,
+        forced: bool = True,
+        backoff: float = 0.01,
+        max_backoff: float = 1.0,
+        quarantine_after: int = 5,
+        quarantine_time: float = 1.0,
+        max_quarantine_time: float = 60.0,
+        clock: Callable[[], float] = monotonic,
+    ):
+        self.sensor = sensor
+        self.forced = forced
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.quarantine_after = quarantine_after
+        self.quarantine_time = quarantine_time
+        self.max_quarantine_time = max_quarantine_time
+        self.clock = clock
+        self.counters = HealthCounters()
+        self.state = Health.healthy
+        self.consecutive_failures = 0
+        self._quarantine_time = quarantine_time
+        self._quarantine_until: Optional[float] = None
+        self._retry_at: Optional[float] = None
+        self._configuration = configuration
+        if configuration is None:
+            try:
+                self._configuration = sensor.configuration
+            except OSError:
+                self.state = Health.quarantined
+                self._quarantine_until = clock()
+
+    def read(self) -> Optional[BMEMeasurement]:
+        """Read a measurement, or return None if the sensor is unavailable."""
+        self.counters.reads += 1
+        if self.state == Health.quarantined:
+            if self.clock() < self._quarantine_until:
+                self.counters.skipped += 1
+                return None
+            if not self.probe():
+                return None
+        elif self.state == Health.degraded:
+            if self.clock() < self._retry_at:
+                self.counters.skipped += 1
+                return None
+            self.counters.retries += 1
+        try:
+            if self.forced:
+                self.sensor.update()
+            measurement = self.sensor.measurement
+        except MeasurementTimeout:
+            self.counters.timeouts += 1
+        except (OSError, ValueError):
+            pass
+        else:
+            self._succeed()
+            return measurement
+        self._fail()
+        return None
+
+    def probe(self) -> bool:
+        """Check if a sensor has recovered by verifying its chip ID and resetting it.
+
+        On success the sensor configuration is restored and the sensor is healthy
+        again, otherwise the quarantine is extended."""
+        self.counters.probes += 1
+        try:
+            if self.sensor.id != self.sensor.chip_id:
+                raise OSError("Unexpected chip ID.")
+            if self._configuration is None:
+                self._configuration = self.sensor.configuration
+            else:
+                self.sensor.reset()
+                sleep(0.002)  # Start-up time after a reset.
+                self.sensor.restore(self._configuration)
+        except OSError:
+            self._quarantine()
+            return False
+        self.counters.recoveries += 1
+        self.state = Health.healthy
+        # Until it delivers a measurement, a single failure quarantines it again.
+        self.consecutive_failures = self.quarantine_after - 1
+        return True
+
+    def _succeed(self) -> None:
+        self.counters.successes += 1
+        self.consecutive_failures = 0
+        self.state = Health.healthy
+        self._quarantine_time = self.quarantine_time
+
+    def _fail(self) -> None:
+        self.counters.failures += 1
+        self.consecutive_failures += 1
+        if self.consecutive_failures >= self.quarantine_after:
+            self.counters.quarantines += 1
+            self._quarantine()
+        else:
+            self.state = Health.degraded
+            self._retry_at = self.clock() + min(
+                self.backoff * 2 ** (self.consecutive_failures - 1), self.max_backoff
+            )
+
+    def _quarantine(self) -> None:
+        """Quarantine the sensor, doubling the time of the next quarantine."""
+        self.state = Health.quarantined
+        self._quarantine_until = self.clock() + self._quarantine_time
+        self._quarantine_time = min(2 * self._quarantine_time, self.max_quarantine_time)
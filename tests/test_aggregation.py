@@ -0,0 +1,160 @@
+from random import Random
+from statistics import pvariance
+
+from pytest import approx, fixture, raises
+
+from bme.aggregation import (
+    QuantileSketch,
+    RunningStatistics,
+    SlidingWindow,
+    TumblingWindow,
+)
+from bme.measurement import BMEMeasurement
+
+
+@fixture()
+def values() -> list:
+    random = Random(42)
+    return [random.gauss(20.0, 5.0) for _ in range(1000)]
+
+
+class TestRunningStatistics:
+    def test_update(self, values):
+        statistics = RunningStatistics()
+        for value in values:
+            statistics.update(value)
+        assert statistics.count == len(values)
+        assert statistics.mean == approx(sum(values) / len(values))
+        assert statistics.variance == approx(pvariance(values))
+        assert statistics.minimum == min(values)
+        assert statistics.maximum == max(values)
+
+    def test_update_many(self, values):
+        statistics = RunningStatistics()
+        statistics.update(values[0])
+        statistics.update_many(values[1:500])
+        statistics.update_many(values[500:])
+        assert statistics.mean == approx(sum(values) / len(values))
+        assert statistics.variance == approx(pvariance(values))
+
+    def test_empty(self):
+        assert RunningStatistics().variance is None
+
+
+class TestQuantileSketch:
+    def test_quantile(self, values):
+        sketch = QuantileSketch(relative_accuracy=0.01)
+        sketch.update_many(values)
+        ordered = sorted(values)
+        for q in (0.0, 0.1, 0.5, 0.9, 1.0):
+            assert sketch.quantile(q) == approx(
+                ordered[int(q * (len(values) - 1))], rel=0.011
+            )
+
+    def test_negative_values(self):
+        sketch = QuantileSketch()
+        sketch.update_many([-10.0, -5.0, 0.0, 5.0, 10.0])
+        assert sketch.quantile(0.0) == approx(-10.0, rel=0.01)
+        assert sketch.quantile(0.5) == 0.0
+        assert sketch.quantile(1.0) == approx(10.0, rel=0.01)
+
+    def test_bounded(self):
+        sketch = QuantileSketch(max_buckets=16)
+        sketch.update_many(range(1, 10000))
+        assert len(sketch._positive) <= 16
+        assert sketch.quantile(1.0) == approx(9999, rel=0.01)
+
+    def test_update_many(self, values):
+        values = values + [0.0, -3.5, -3.5, 1e-12]
+        batch, single = QuantileSketch(), QuantileSketch()
+        batch.update_many(values)
+        for value in values:
+            single.update(value)
+        assert batch._positive == single._positive
+        assert batch._negative == single._negative
+        assert (batch._zero, batch.count) == (single._zero, single.count)
+
+    def test_merge(self, values):
+        left, right, full = QuantileSketch(), QuantileSketch(), QuantileSketch()
+        left.update_many(values[:300])
+        right.update_many(values[300:])
+        full.update_many(values)
+        left.merge(right)
+        assert left.count == full.count
+        assert left.quantile(0.5) == full.quantile(0.5)
+
+
+class TestTumblingWindow:
+    def test_add(self):
+        window = TumblingWindow(duration=1.0)
+        assert window.add(BMEMeasurement(20.0, 1000.0, 50.0), timestamp=10.2) is None
+        assert window.add(BMEMeasurement(22.0, 1002.0, None), timestamp=10.9) is None
+        summary = window.add(BMEMeasurement(30.0, 1010.0, 60.0), timestamp=11.1)
+        assert (summary.start, summary.end, summary.count) == (10.0, 11.0, 2)
+        assert summary.fields["temperature"].mean == approx(21.0)
+        assert summary.fields["pressure"].maximum == 1002.0
+        assert summary.fields["humidity"].count == 1
+        assert summary.fields["absolute_humidity"].mean == approx(
+            BMEMeasurement(20.0, 1000.0, 50.0).absolute_humidity
+        )
+        assert window.flush().fields["temperature"].mean == 30.0
+        assert window.flush() is None
+
+    def test_extend(self):
+        measurements = [BMEMeasurement(float(i), 1000.0) for i in range(10)]
+        timestamps = [i * 0.5 for i in range(10)]
+        window = TumblingWindow(duration=2.0)
+        summaries = window.extend(measurements, timestamps)
+        assert [s.fields["temperature"].mean for s in summaries] == [1.5, 5.5]
+        assert window.flush().fields["temperature"].mean == 8.5
+
+    def test_extend_decreasing_timestamp(self):
+        window = TumblingWindow(duration=10.0)
+        measurements = [BMEMeasurement(20.0, 1000.0), BMEMeasurement(21.0, 1000.0)]
+        with raises(ValueError):
+            window.extend(measurements, [15.0, 5.0])
+        assert window.flush() is None
+
+    def test_decreasing_timestamp(self):
+        window = TumblingWindow(duration=1.0)
+        window.add(BMEMeasurement(20.0, 1000.0), timestamp=5.0)
+        with raises(ValueError):
+            window.add(BMEMeasurement(20.0, 1000.0), timestamp=3.0)
+
+
+class TestSlidingWindow:
+    def test_summary(self):
+        window = SlidingWindow(duration=10.0, panes=10)
+        for second in range(30):
+            window.add(BMEMeasurement(float(second), 1000.0), timestamp=second + 0.5)
+        summary = window.summary()
+        assert summary.count == 10
+        assert summary.fields["temperature"].minimum == 20.0
+        assert summary.fields["temperature"].maximum == 29.0
+        assert len(window._panes) <= 10
+
+    def test_extend(self):
+        window = SlidingWindow(duration=10.0, panes=10)
+        window.extend(
+            [BMEMeasurement(float(i), 1000.0) for i in range(30)],
+            [i + 0.5 for i in range(30)],
+        )
+        assert window.summary().fields["temperature"].mean == approx(24.5)
+        assert window.summary(timestamp=100.0).count == 0
+        assert window.summary().count == 10
+
+    def test_extend_decreasing_timestamp(self):
+        window = SlidingWindow(duration=10.0, panes=10)
+        measurements = [BMEMeasurement(20.0, 1000.0), BMEMeasurement(21.0, 1000.0)]
+        with raises(ValueError):
+            window.extend(measurements, [5.5, 5.0])
+        assert window.summary(timestamp=6.0).count == 0
+
+    def test_summary_does_not_evict(self):
+        window = SlidingWindow(duration=10.0, panes=10)
+        for second in range(5):
+            window.add(BMEMeasurement(float(second), 1000.0), timestamp=second + 0.5)
+        assert window.summary(timestamp=100.0).count == 0
+        window.add(BMEMeasurement(5.0, 1000.0), timestamp=5.5)
+        assert window.summary().count == 6
+        assert window.summary(timestamp=2.5).count == 3
@@ -0,0 +1,221 @@
+from pytest import approx, fixture, raises
+
+from bme.bme280 import BME280
+from bme.bmp280 import BMP280
+from bme.exceptions import MeasurementTimeout
+from bme.health import Health, MonitoredSensor
+from bme.measurement import BMEMeasurement
+
+
+class FakeSensor:
+    chip_id = 0x58
+
+    def __init__(self):
+        self.error = None
+        self.id = self.chip_id
+        self.resets = 0
+        self.restored = None
+
+    def update(self):
+        if self.error is not None:
+            raise self.error
+
+    @property
+    def measurement(self):
+        return BMEMeasurement(20.0, 100000.0)
+
+    def reset(self):
+        self.resets += 1
+
+    @property
+    def configuration(self):
+        if self.error is not None:
+            raise self.error
+        return {0xF5: 0x00, 0xF4: 0x27}
+
+    def restore(self, configuration):
+        self.restored = configuration
+
+
+class Clock:
+    def __init__(self):
+        self.time = 0.0
+
+    def __call__(self):
+        return self.time
+
+
+@fixture()
+def sensor() -> FakeSensor:
+    return FakeSensor()
+
+
+@fixture()
+def clock() -> Clock:
+    return Clock()
+
+
+@fixture()
+def monitored(sensor, clock) -> MonitoredSensor:
+    return MonitoredSensor(sensor, backoff=0.1, quarantine_after=3, clock=clock)
+
+
+class TestMonitoredSensor:
+    def test_healthy(self, monitored):
+        assert monitored.read() == BMEMeasurement(20.0, 100000.0)
+        assert monitored.state == Health.healthy
+        assert monitored.counters.successes == 1
+
+    def test_degraded(self, monitored, sensor, clock):
+        sensor.error = OSError("Remote I/O error")
+        assert monitored.read() is None
+        assert monitored.state == Health.degraded
+        sensor.error = None
+        assert monitored.read() is None  # Backing off, without accessing the bus.
+        assert monitored.counters.skipped == 1
+        clock.time = 0.1
+        assert monitored.read() is not None
+        assert monitored.state == Health.healthy
+        assert monitored.counters.retries == 1
+
+    def test_backoff(self, monitored, sensor, clock):
+        sensor.error = OSError("Remote I/O error")
+        monitored.read()
+        clock.time = 0.1
+        monitored.read()
+        clock.time = 0.25
+        monitored.read()
+        assert monitored.counters.failures == 2  # The backoff was doubled.
+        clock.time = 0.35
+        monitored.read()
+        assert monitored.counters.failures == 3
+
+    def test_corrupt_registers(self, monitored, sensor):
+        sensor.error = ValueError("255 is not a valid Mode")
+        assert monitored.read() is None
+        assert monitored.state == Health.degraded
+        assert monitored.counters.failures == 1
+
+    def test_timeout(self, monitored, sensor):
+        sensor.error = MeasurementTimeout()
+        assert monitored.read() is None
+        assert monitored.counters.timeouts == 1
+
+    def test_quarantine_and_recovery(self, monitored, sensor, clock):
+        sensor.error = OSError("Remote I/O error")
+        for time in (0.0, 0.1, 0.35):
+            clock.time = time
+            monitored.read()
+        assert monitored.state == Health.quarantined
+        assert monitored.counters.quarantines == 1
+        sensor.error = None
+        assert monitored.read() is None
+        assert monitored.counters.skipped == 1
+        clock.time = 1.5
+        assert monitored.read() is not None
+        assert monitored.state == Health.healthy
+        assert sensor.resets == 1
+        assert sensor.restored == {0xF5: 0x00, 0xF4: 0x27}
+        assert monitored.counters.recoveries == 1
+
+    def test_failed_probe(self, monitored, sensor, clock):
+        sensor.error = OSError("Remote I/O error")
+        for time in (0.0, 0.1, 0.35):
+            clock.time = time
+            monitored.read()
+        sensor.id = 0xFF
+        clock.time = 1.5
+        assert monitored.read() is None
+        assert monitored.state == Health.quarantined
+        assert sensor.resets == 0
+        clock.time = 3.0
+        monitored.read()
+        assert monitored.counters.probes == 1  # The quarantine was doubled.
+        clock.time = 3.6
+        monitored.read()
+        assert monitored.counters.probes == 2
+
+    def test_stuck_after_probe(self, monitored, sensor, clock):
+        sensor.error = MeasurementTimeout()
+        for time in (0.0, 0.1, 0.35):
+            clock.time = time
+            monitored.read()
+        assert monitored.counters.quarantines == 1
+        # The probe succeeds, but the sensor keeps timing out.
+        for time, quarantines in ((1.35, 2), (3.35, 3), (7.35, 4)):
+            clock.time = time - 0.01
+            monitored.read()
+            assert monitored.counters.quarantines == quarantines - 1
+            clock.time = time
+            assert monitored.read() is None
+            assert monitored.state == Health.quarantined
+            assert monitored.counters.quarantines == quarantines
+        assert sensor.resets == 3
+        sensor.error = None
+        clock.time = 15.35
+        assert monitored.read() is not None
+        assert monitored._quarantine_time == monitored.quarantine_time
+
+    def test_wrap_unavailable(self, sensor, clock):
+        sensor.error = OSError("Remote I/O error")
+        monitored = MonitoredSensor(sensor, clock=clock)
+        assert monitored.state == Health.quarantined
+        sensor.error = None
+        assert monitored.read() is not None
+        assert sensor.resets == 0
+        assert monitored._configuration == {0xF5: 0x00, 0xF4: 0x27}
+
+
+def bus(mocker, registers: dict):
+    def read(address, register, length):
+        return [registers.get(register + offset, 0) for offset in range(length)]
+
+    return mocker.Mock(read_i2c_block_data=mocker.Mock(side_effect=read))
+
+
+class TestTiming:
+    def test_bmp280_measurement_time(self, mocker):
+        sensor = BMP280(bus(mocker, {0xD0: 0x58, 0xF4: 0b001_001_00}))
+        assert sensor.measurement_time == approx(0.006425)
+
+    def test_bme280_measurement_time(self, mocker):
+        sensor = BME280(bus(mocker, {0xD0: 0x60, 0xF2: 0b001, 0xF4: 0b010_101_00}))
+        assert sensor.measurement_time == approx(
+            (1.25 + 2.3 * 2 + 2.3 * 16 + 0.575 + 2.3 + 0.575) / 1000
+        )
+
+    def test_oversampling_above_16(self, mocker):
+        sensor = BMP280(bus(mocker, {0xD0: 0x58, 0xF4: 0b111_110_01}))
+        assert sensor.measurement_time == approx((1.25 + 2 * 2.3 * 16 + 0.575) / 1000)
+        sensor.update()
+
+    def test_update(self, mocker):
+        sensor_bus = bus(mocker, {0xD0: 0x58, 0xF4: 0b001_001_00})
+        BMP280(sensor_bus).update()
+        sensor_bus.write_i2c_block_data.assert_called_once_with(
+            0x76, register=0xF4, data=[0b001_001_01]
+        )
+        # Reading the chip ID, ctrl_meas and the status.
+        assert sensor_bus.read_i2c_block_data.call_count == 3
+
+    def test_update_timeout(self, mocker):
+        sensor = BMP280(bus(mocker, {0xD0: 0x58, 0xF3: 0b1000, 0xF4: 0b001_001_00}))
+        with raises(MeasurementTimeout):
+            sensor.update(timeout=0.001)
+
+    def test_update_preempted(self, mocker):
+        # The thread is preempted during the first status read, until after the
+        # deadline, by which time the measurement has finished.
+        clock = Clock()
+        statuses = iter([0b1000, 0b0000])
+
+        def read(address, register, length):
+            if register == 0xF3:
+                status = next(statuses)
+                clock.time = 1.0
+                return [status]
+            return [{0xD0: 0x58, 0xF4: 0b001_001_00}.get(register, 0)]
+
+        mocker.patch("bme.bmp280.bmp280.monotonic", side_effect=clock)
+        sensor = BMP280(mocker.Mock(read_i2c_block_data=mocker.Mock(side_effect=read)))
+        sensor.update()